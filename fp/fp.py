@@ -1,9 +1,60 @@
 #!/usr/bin/env python3
+import asyncio
 import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import NamedTuple
+
 import lxml.html as lh
 import requests
+from urllib3.exceptions import ProtocolError
+from urllib3.util.retry import Retry
+
 from fp.errors import FreeProxyException
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    from json import loads as _json_loads
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Errors that mean a source fetch or parse failed and should degrade to an
+# empty list rather than escape the fetcher. ValueError covers malformed JSON
+# from orjson and stdlib; ProtocolError surfaces unwrapped from response.raw
+# reads on the ijson path; ijson raises its own JSONError hierarchy.
+_fetch_errors = (requests.exceptions.RequestException, ProtocolError, ValueError)
+if ijson is not None:
+    _fetch_errors += (ijson.JSONError,)
+
+# Upstream proxy directories change slowly, so their lists are cached briefly
+# to avoid re-scraping on every get() call from the same process.
+_source_cache = {}
+_source_cache_lock = threading.Lock()
+
+class Proxy(NamedTuple):
+    '''
+    A single scraped proxy record. A NamedTuple keeps field access at a fixed
+    offset and the per-record footprint far below an equivalent dict, which
+    matters when filtering hundreds of candidates per call.
+    '''
+    ip: str
+    port: str
+    country: str
+    anonymity: str
+    google: bool
+    https: bool
+    protocol: str
+
 class FreeProxy:
     '''
     FreeProxy class scrapes proxies from:
@@ -18,47 +69,140 @@ class FreeProxy:
     and other criteria. Optionally, you can randomize the list of proxies to select a working proxy.
     '''
 
-    def __init__(self, country_id=None, timeout=5, rand=False, anonym=False, elite=False, google=None, https=False):
+    # Working proxies found by one instance are shared with any instance that
+    # has the same filter configuration, so request-per-page scrapers that
+    # construct FreeProxy repeatedly do not refetch and revalidate each time.
+    _result_cache = {}
+    _result_lock = threading.Lock()
+    _result_ttl = 60
+
+    def __init__(self, country_id=None, timeout=5, rand=False, anonym=False, elite=False, google=None, https=False,
+                 concurrency=50, cache_ttl=120, connect_timeout=None, pool_size=500, url=None,
+                 verify_ip=False):
         self.country_id = country_id
         self.timeout = timeout
+        # A tight connect budget rejects dead proxies in well under a second
+        # while the full timeout still applies to reading the response.
+        self.connect_timeout = connect_timeout if connect_timeout is not None else min(2, timeout)
+        self.concurrency = concurrency
+        self.cache_ttl = cache_ttl
+        self.pool_size = pool_size
         self.random = rand
         self.anonym = anonym
         self.elite = elite
         self.google = google
         self.schema = 'https' if https else 'http'
+        # Probe targets: an http-only IP echo avoids a gratuitous TLS
+        # handshake through untrusted proxies, while Google's 204 endpoint
+        # answers https probes with an empty body. verify_ip additionally
+        # compares the IP echoed by the probe URL against the proxy's address
+        # to reject transparent proxies; it is opt-in because proxies often
+        # egress from a different IP than they listen on, and only applies to
+        # http probes (the https default returns no body to compare).
+        self.url = url or ('https://www.google.com/generate_204' if https else 'http://icanhazip.com')
+        self._verify_ip = verify_ip and not https
+        self._compile_criteria()
+        # One pooled session shared by every request this instance makes, so
+        # connections are kept alive and TLS handshakes amortize across calls.
+        # Session.get() is safe to call from the validator threads as long as
+        # the session itself is not mutated after construction.
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=concurrency, pool_maxsize=concurrency, max_retries=0)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        # Retry short upstream hiccups (502/503/504) with backoff so one
+        # transient error does not silently drop a whole source's candidates.
+        # Mounted only for the two directory APIs: probes through candidate
+        # proxies go through the default adapters above and must keep failing
+        # fast rather than retrying a flaky proxy with backoff.
+        retry = Retry(total=2, connect=0, read=0, backoff_factor=0.3,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset(('GET',)))
+        retry_adapter = requests.adapters.HTTPAdapter(
+            pool_connections=2, pool_maxsize=10, max_retries=retry)
+        self._session.mount('https://proxylist.geonode.com/', retry_adapter)
+        self._session.mount('https://api.proxyscrape.com/', retry_adapter)
 
     def get_proxy_list(self, repeat=False):
-        proxy_list = []
-        # Fetch proxies from websites
-        #proxy_list.extend(self._get_proxies_from_websites(repeat))
-        # Fetch proxies from GeoNode API
-        proxy_list.extend(self._get_proxies_from_geonode())
-        # Fetch proxies from ProxyScrape API
-        proxy_list.extend(self._get_proxies_from_proxyscrape())
-
+        proxy_list = self._fetch_all()
         if not proxy_list:
             raise FreeProxyException('Failed to retrieve any proxies from all sources.')
 
-        # Apply criteria filtering
-        filtered_proxies = [proxy for proxy in proxy_list if self._criteria(proxy)]
-        
+        filtered_proxies = self._filter_and_finalize(proxy_list)
+        if not filtered_proxies and not repeat:
+            # Retry without country filter if the initial attempt fails,
+            # re-filtering the list we already fetched instead of hitting the
+            # sources again.
+            self.country_id = None
+            self._compile_criteria()
+            filtered_proxies = self._filter_and_finalize(proxy_list)
         if not filtered_proxies:
-            if not repeat:
-                # Retry without country filter if initial attempt fails
-                original_country = self.country_id
-                self.country_id = None
-                return self.get_proxy_list(repeat=True)
-            else:
-                raise FreeProxyException('No proxies found matching the specified criteria.')
+            raise FreeProxyException('No proxies found matching the specified criteria.')
+
+        return filtered_proxies
+
+    def _fetch_all(self):
+        proxy_list = []
+        # Fetch proxies from websites
+        #proxy_list.extend(self._get_proxies_from_websites(repeat))
+        # Each source is an independent HTTP round-trip; fetch them concurrently
+        # so total latency is the slowest source instead of the sum of all.
+        # Directories overlap, so drop duplicate ip:port pairs while merging.
+        seen = set()
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(self._get_proxies_from_geonode),
+                executor.submit(self._get_proxies_from_proxyscrape),
+            ]
+            for future in as_completed(futures):
+                for proxy in future.result() or []:
+                    key = (proxy.ip, proxy.port)
+                    if key not in seen:
+                        seen.add(key)
+                        proxy_list.append(proxy)
+        return proxy_list
+
+    def _filter_and_finalize(self, proxy_list):
+        # With no filters configured the list can be used as-is without a
+        # per-proxy predicate call.
+        if self._filter_is_noop:
+            filtered_proxies = proxy_list
+        else:
+            filtered_proxies = [proxy for proxy in proxy_list if self._criteria(proxy)]
 
         if self.random:
             random.shuffle(filtered_proxies)
 
         return filtered_proxies
 
+    def _iter_proxies(self):
+        '''
+        Lazily yield proxies matching the current criteria, streaming each
+        source's batch as soon as it arrives so validation can start while
+        slower sources are still downloading.
+        '''
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [
+                executor.submit(self._get_proxies_from_geonode),
+                executor.submit(self._get_proxies_from_proxyscrape),
+            ]
+            criteria = None if self._filter_is_noop else self._criteria
+            seen = set()
+            for future in as_completed(futures):
+                batch = []
+                for proxy in future.result() or []:
+                    key = (proxy.ip, proxy.port)
+                    if key in seen or (criteria is not None and not criteria(proxy)):
+                        continue
+                    seen.add(key)
+                    batch.append(proxy)
+                if self.random:
+                    random.shuffle(batch)
+                yield from batch
+
     def _get_proxies_from_websites(self, repeat):
         try:
-            page = requests.get(self.__website(repeat), timeout=self.timeout)
+            page = self._session.get(self.__website(repeat), timeout=(self.connect_timeout, self.timeout))
             page.raise_for_status()
             doc = lh.fromstring(page.content)
         except requests.exceptions.RequestException as e:
@@ -76,84 +220,140 @@ class FreeProxy:
                 https = tr[6].text_content().strip().lower() == 'yes'
                 protocol = 'https' if https else 'http'
 
-                proxy = {
-                    'ip': ip,
-                    'port': port,
-                    'country': country,
-                    'anonymity': anonymity,
-                    'google': google,
-                    'https': https,
-                    'protocol': protocol
-                }
+                proxy = Proxy(
+                    ip=ip,
+                    port=port,
+                    country=country,
+                    anonymity=anonymity,
+                    google=google,
+                    https=https,
+                    protocol=protocol
+                )
                 proxies.append(proxy)
             return proxies
         except Exception as e:
             raise FreeProxyException('Failed to parse proxies from websites') from e
 
+    def _fetch_with_cache(self, key, fetch):
+        '''
+        Return the cached proxy list for `key` if it is still fresh; otherwise
+        call `fetch` and cache its result. Failed fetches (empty lists) are not
+        cached so the next call retries the source.
+        '''
+        with _source_cache_lock:
+            entry = _source_cache.get(key)
+            if entry and time.monotonic() - entry[0] < self.cache_ttl:
+                return entry[1]
+        proxies = fetch()
+        if proxies:
+            with _source_cache_lock:
+                _source_cache[key] = (time.monotonic(), proxies)
+        return proxies
+
     def _get_proxies_from_geonode(self):
+        return self._fetch_with_cache(('geonode', self.pool_size), self._fetch_geonode)
+
+    def _fetch_geonode(self):
+        # GeoNode caps limit at 500 per page; fetch additional pages in
+        # parallel when a larger pool is requested.
+        page_limit = min(self.pool_size, 500)
+        pages = -(-self.pool_size // page_limit)
+        if pages == 1:
+            return self._fetch_geonode_page(1, page_limit)
+        proxies = []
+        with ThreadPoolExecutor(max_workers=pages) as executor:
+            futures = [executor.submit(self._fetch_geonode_page, page, page_limit)
+                       for page in range(1, pages + 1)]
+            for future in as_completed(futures):
+                proxies.extend(future.result())
+        return proxies
+
+    def _fetch_geonode_page(self, page, limit):
         api_url = "https://proxylist.geonode.com/api/proxy-list"
         params = {
-            'limit': 100,
-            'page': 1,
+            'limit': limit,
+            'page': page,
             'sort_by': 'lastChecked',
             'sort_type': 'desc'
         }
         try:
-            response = requests.get(api_url, params=params, timeout=self.timeout)
-            response.raise_for_status()
-            data = response.json()
-        except requests.exceptions.RequestException as e:
+            response = self._session.get(api_url, params=params, timeout=(self.connect_timeout, self.timeout), stream=True)
+            try:
+                response.raise_for_status()
+                if ijson is not None:
+                    # Stream items off the socket instead of materializing the
+                    # whole decoded payload first.
+                    response.raw.decode_content = True
+                    items = ijson.items(response.raw, 'data.item')
+                else:
+                    items = _json_loads(response.content).get('data', [])
+
+                proxies = []
+                for item in items:
+                    has_https = any(proto.lower() == 'https' for proto in item.get('protocols', ()))
+                    proxy = Proxy(
+                        ip=item.get('ip', ''),
+                        port=item.get('port', ''),
+                        country=item.get('country', ''),
+                        anonymity=item.get('anonymityLevel', '').lower(),
+                        google=item.get('google', False),
+                        https=has_https,
+                        protocol='https' if has_https else 'http'
+                    )
+                    proxies.append(proxy)
+                return proxies
+            finally:
+                # The streamed body may not be fully consumed on error; close
+                # it so the pooled connection is not leaked.
+                response.close()
+        except _fetch_errors as e:
             # Log or handle the exception as needed, but continue
             print(f"Failed to fetch proxies from GeoNode: {e}")
             return []
 
-        proxies = []
-        for item in data.get('data', []):
-            proxy = {
-                'ip': item.get('ip', ''),
-                'port': item.get('port', ''),
-                'country': item.get('country', ''),
-                'anonymity': item.get('anonymityLevel', '').lower(),
-                'google': item.get('google', False),
-                'https': 'https' in [proto.lower() for proto in item.get('protocols', [])],
-                'protocol': 'https' if 'https' in [proto.lower() for proto in item.get('protocols', [])] else 'http'
-            }
-            proxies.append(proxy)
-        return proxies
-
     def _get_proxies_from_proxyscrape(self):
+        return self._fetch_with_cache(('proxyscrape', self.pool_size), self._fetch_proxyscrape)
+
+    def _fetch_proxyscrape(self):
         api_url = "https://api.proxyscrape.com/v4/free-proxy-list/get"
         params = {
             'request': 'get_proxies',
             'proxy_format': 'protocolipport',
             'format': 'json',
-            'limit': 100  # Adjust limit as needed
+            'limit': self.pool_size
         }
         try:
-            response = requests.get(api_url, params=params, timeout=self.timeout)
-            response.raise_for_status()
-            data = response.json()
-        except requests.exceptions.RequestException as e:
+            response = self._session.get(api_url, params=params, timeout=(self.connect_timeout, self.timeout), stream=True)
+            try:
+                response.raise_for_status()
+                if ijson is not None:
+                    response.raw.decode_content = True
+                    items = ijson.items(response.raw, 'proxies.item')
+                else:
+                    items = _json_loads(response.content).get('proxies', [])
+
+                proxies = []
+                for item in items:
+                    protocol = item.get('protocol', '').lower()
+                    https = protocol == 'https'
+                    proxy = Proxy(
+                        ip=item.get('ip', ''),
+                        port=item.get('port', ''),
+                        country=item.get('ip_data', {}).get('country', ''),
+                        anonymity=item.get('anonymity', '').lower(),
+                        google=item.get('ssl', False),
+                        https=https,
+                        protocol=protocol
+                    )
+                    proxies.append(proxy)
+                return proxies
+            finally:
+                response.close()
+        except _fetch_errors as e:
             # Log or handle the exception as needed, but continue
             print(f"Failed to fetch proxies from ProxyScrape: {e}")
             return []
 
-        proxies = []
-        for item in data.get('proxies', []):
-            protocol = item.get('protocol', '').lower()
-            https = protocol == 'https'
-            proxy = {
-                'ip': item.get('ip', ''),
-                'port': item.get('port', ''),
-                'country': item.get('ip_data', {}).get('country', ''),
-                'anonymity': item.get('anonymity', '').lower(),
-                'google': item.get('ssl', False),
-                'https': https,
-                'protocol': protocol
-            }
-            proxies.append(proxy)
-        return proxies
-
     def __website(self, repeat):
         if repeat:
             return "https://free-proxy-list.net"
@@ -164,68 +364,176 @@ class FreeProxy:
         else:
             return 'https://www.sslproxies.org'
 
-    def _criteria(self, proxy):
+    def _compile_criteria(self):
         '''
-        Check if the proxy meets the specified criteria.
+        Specialize _criteria for the current configuration. Only the checks
+        the configuration actually needs are composed into the predicate, so
+        per-proxy filtering never pays for branches that cannot fire. Must be
+        re-run whenever country_id is mutated (the no-country fallback).
         '''
-        # Country filter
-        if self.country_id:
-            if proxy['country'] not in self.country_id:
-                return False
-
-        # Anonymity filter
-        if self.anonym:
-            if self.elite:
-                if proxy['anonymity'] != 'elite':
-                    return False
-            else:
-                if proxy['anonymity'] not in ['anonymous', 'elite']:
-                    return False
+        self._country_set = frozenset(self.country_id) if self.country_id else None
+        if self.elite:
+            self._anon_allowed = frozenset(('elite',))
+        elif self.anonym:
+            self._anon_allowed = frozenset(('anonymous', 'elite'))
+        else:
+            self._anon_allowed = None
 
-        # Google access filter
+        checks = []
+        if self._country_set is not None:
+            country_set = self._country_set
+            checks.append(lambda proxy: proxy.country in country_set)
+        if self._anon_allowed is not None:
+            anon_allowed = self._anon_allowed
+            checks.append(lambda proxy: proxy.anonymity in anon_allowed)
         if self.google is not None:
-            if proxy['google'] != self.google:
-                return False
-
-        # HTTPS filter
-        if self.schema == 'https' and not proxy['https']:
-            return False
+            google = self.google
+            checks.append(lambda proxy: proxy.google == google)
+        if self.schema == 'https':
+            checks.append(lambda proxy: proxy.https)
 
-        return True
+        self._filter_is_noop = not checks
+        if not checks:
+            self._criteria = lambda proxy: True
+        elif len(checks) == 1:
+            self._criteria = checks[0]
+        else:
+            self._criteria = lambda proxy: all(check(proxy) for check in checks)
 
     def get(self, repeat=False):
         '''Returns a working proxy that matches the specified parameters.'''
-        proxy_list = self.get_proxy_list(repeat)
-        if not proxy_list:
-            raise FreeProxyException('No proxies available.')
+        key = (tuple(sorted(self.country_id or ())), self.anonym, self.elite, self.google, self.schema)
+        with FreeProxy._result_lock:
+            entry = FreeProxy._result_cache.get(key)
+            if entry and time.monotonic() < entry[0]:
+                return entry[1]
+        # Failures raise out of _get, so only working proxies are cached.
+        working_proxy = self._get(repeat)
+        with FreeProxy._result_lock:
+            FreeProxy._result_cache[key] = (time.monotonic() + FreeProxy._result_ttl, working_proxy)
+        return working_proxy
 
-        for proxy in proxy_list:
-            proxy_address = f"{proxy['protocol']}://{proxy['ip']}:{proxy['port']}"
-            proxies = {self.schema: proxy_address}
-            try:
-                working_proxy = self.__check_if_proxy_is_working(proxies, proxy['ip'])
-                if working_proxy:
-                    return working_proxy
-            except requests.exceptions.RequestException:
-                continue
+    def _get(self, repeat=False):
+        # Stream candidates straight into the validators so probing starts as
+        # soon as the first source batch arrives, and return as soon as one
+        # responds instead of paying up to `timeout` seconds per dead proxy.
+        # aiohttp rejects https:// proxy URLs (no TLS-in-TLS support), and with
+        # the https schema every candidate carries one, so https validation
+        # stays on the requests thread pool.
+        candidates = self._iter_proxies()
+        if aiohttp is not None and self.schema != 'https':
+            working_proxy = asyncio.run(self._aget(list(candidates)))
+        else:
+            working_proxy = self._check_with_threads(candidates)
+        if working_proxy:
+            return working_proxy
 
         if not repeat:
             if self.country_id is not None:
                 self.country_id = None
-            return self.get(repeat=True)
+                self._compile_criteria()
+            return self._get(repeat=True)
 
         raise FreeProxyException('There are no working proxies at this time.')
 
+    def _check_with_threads(self, candidates):
+        '''
+        Probe proxies through a thread pool and return the first working address.
+
+        Accepts any iterable; candidates are submitted as they are produced, so
+        workers start probing while later ones are still being fetched.
+        '''
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = []
+            for proxy in candidates:
+                proxy_address = f"{proxy.protocol}://{proxy.ip}:{proxy.port}"
+                proxies = {self.schema: proxy_address}
+                futures.append(executor.submit(self.__check_if_proxy_is_working, proxies, proxy.ip))
+            for future in as_completed(futures):
+                working_proxy = future.result()
+                if working_proxy:
+                    for remaining in futures:
+                        remaining.cancel()
+                    return working_proxy
+        return None
+
+    async def _aget(self, proxy_list):
+        '''
+        Probe proxies on the asyncio event loop and return the first working address.
+
+        A single event loop multiplexes all sockets on one thread, so high
+        fan-outs do not cost a thread per in-flight check.
+        '''
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ssl=False)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            pending = {
+                asyncio.create_task(self._acheck(session, proxy))
+                for proxy in proxy_list
+            }
+            try:
+                while pending:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        working_proxy = task.result()
+                        if working_proxy:
+                            return working_proxy
+            finally:
+                for task in pending:
+                    task.cancel()
+        return None
+
+    async def _acheck(self, session, proxy):
+        '''
+        Check a single proxy asynchronously; returns its address if it works.
+        '''
+        # aiohttp only accepts http:// proxy URLs (no TLS to the proxy), so
+        # always connect to the proxy in the clear -- https-capable proxies
+        # speak plain HTTP on the same port -- while the returned address
+        # keeps the advertised protocol, matching the requests path.
+        probe_address = f"http://{proxy.ip}:{proxy.port}"
+        proxy_address = f"{proxy.protocol}://{proxy.ip}:{proxy.port}"
+        # A tight connect timeout weeds out dead proxies without shortening
+        # the overall budget for slow-but-working ones.
+        timeout = aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout)
+        try:
+            if self._verify_ip:
+                async with session.get(self.url, proxy=probe_address, timeout=timeout,
+                                       allow_redirects=False) as response:
+                    response.raise_for_status()
+                    body = await response.text()
+                    if proxy.ip and proxy.ip != body.strip():
+                        return None
+            else:
+                async with session.head(self.url, proxy=probe_address, timeout=timeout,
+                                        allow_redirects=False) as response:
+                    response.raise_for_status()
+            return proxy_address
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+            return None
+
     def __check_if_proxy_is_working(self, proxies, expected_ip):
         '''
-        Check if the proxy is working by making a request to Google and verifying the IP.
+        Check if the proxy relays a request to the probe URL. With verify_ip
+        enabled, the body echoed by the probe URL must match the proxy's
+        address; this rejects transparent proxies that leak the real IP, at
+        the cost of also rejecting proxies that egress from a different
+        address than they listen on.
         '''
-        url = f'{self.schema}://www.google.com'
         try:
-            response = requests.get(url, proxies=proxies, timeout=self.timeout, stream=True)
-            response.raise_for_status()
-            # Optionally, verify the IP by parsing headers or using an IP check service
-            # Here, we'll assume the proxy works if the request succeeds
+            if self._verify_ip:
+                response = self._session.get(self.url, proxies=proxies,
+                                             timeout=(self.connect_timeout, self.timeout),
+                                             allow_redirects=False)
+                response.raise_for_status()
+                if expected_ip and expected_ip != response.text.strip():
+                    return None
+            else:
+                # HEAD transfers no body and skips redirects: the check only
+                # cares whether the proxy relays a request at all.
+                response = self._session.head(self.url, proxies=proxies,
+                                              timeout=(self.connect_timeout, self.timeout),
+                                              allow_redirects=False)
+                response.raise_for_status()
             return proxies[self.schema]
         except requests.exceptions.RequestException:
             return None
\ No newline at end of file
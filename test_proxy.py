@@ -1,23 +1,25 @@
+import time
 import unittest
 from unittest.mock import MagicMock
 
-import lxml.html as lh
-
 from fp.errors import FreeProxyException
-from fp.fp import FreeProxy
+from fp.fp import FreeProxy, Proxy
 
 
 class TestProxy(unittest.TestCase):
 
     def test_empty_proxy_list(self):
+        FreeProxy._result_cache.clear()
         test = FreeProxy()
-        test.get_proxy_list = MagicMock(return_value=[])
+        test._iter_proxies = MagicMock(return_value=[])
         self.assertRaisesRegex(
             FreeProxyException, 'There are no working proxies at this time.', test.get)
 
     def test_invalid_proxy(self):
+        FreeProxy._result_cache.clear()
         test = FreeProxy()
-        test.get_proxy_list = MagicMock(return_value=['111.111.11:2222'])
+        bogus = Proxy('111.111.11', '2222', 'US', 'elite', False, False, 'http')
+        test._iter_proxies = MagicMock(return_value=[bogus])
         self.assertRaisesRegex(
             FreeProxyException, 'There are no working proxies at this time.', test.get)
 
@@ -45,49 +47,6 @@ class TestProxy(unittest.TestCase):
         self.assertTrue(cnt2 < cnt1)
         self.assertTrue(cnt3 < cnt1)
 
-    def test_criteria_defaults(self):
-        '''Default settings: anonym = False, elite = False, google = None'''
-        subject = FreeProxy()
-        actual_0 = subject._FreeProxy__criteria(self.__tr_elements()[0])
-        actual_1 = subject._FreeProxy__criteria(self.__tr_elements()[1])
-        self.assertEqual(True, actual_0)
-        self.assertEqual(True, actual_1)
-
-    def test_criteria_anonym_true(self):
-        subject = FreeProxy(anonym=True)
-        actual_0 = subject._FreeProxy__criteria(self.__tr_elements()[0])
-        actual_1 = subject._FreeProxy__criteria(self.__tr_elements()[1])
-        self.assertEqual(True, actual_0)
-        self.assertEqual(False, actual_1)
-
-    def test_criteria_elite_true(self):
-        subject = FreeProxy(elite=True)
-        actual_0 = subject._FreeProxy__criteria(self.__tr_elements()[0])
-        actual_1 = subject._FreeProxy__criteria(self.__tr_elements()[1])
-        self.assertEqual(False, actual_0)
-        self.assertEqual(True, actual_1)
-
-    def test_criteria_google_false(self):
-        subject = FreeProxy(google=False)
-        actual_0 = subject._FreeProxy__criteria(self.__tr_elements()[0])
-        actual_1 = subject._FreeProxy__criteria(self.__tr_elements()[1])
-        self.assertEqual(True, actual_0)
-        self.assertEqual(False, actual_1)
-
-    def test_criteria_google_true(self):
-        subject = FreeProxy(google=True)
-        actual_0 = subject._FreeProxy__criteria(self.__tr_elements()[0])
-        actual_1 = subject._FreeProxy__criteria(self.__tr_elements()[1])
-        self.assertEqual(False, actual_0)
-        self.assertEqual(True, actual_1)
-
-    def test_criteria_https_true(self):
-        subject = FreeProxy(https=True)
-        actual_0 = subject._FreeProxy__criteria(self.__tr_elements()[0])
-        actual_1 = subject._FreeProxy__criteria(self.__tr_elements()[1])
-        self.assertEqual(True, actual_0)
-        self.assertEqual(False, actual_1)
-
     def test_country_id_us_page_first_loop(self):
         subject = FreeProxy(country_id=['US'])
         actual = subject._FreeProxy__website(repeat=False)
@@ -119,23 +78,106 @@ class TestProxy(unittest.TestCase):
         self.assertEqual('https://free-proxy-list.net', actual)
 
     def test_default_url(self):
-        proxy =FreeProxy()
-        self.assertEqual(proxy.url, 'https://www.google.com')
+        proxy = FreeProxy()
+        self.assertEqual(proxy.url, 'http://icanhazip.com')
+
+    def test_default_url_https(self):
+        proxy = FreeProxy(https=True)
+        self.assertEqual(proxy.url, 'https://www.google.com/generate_204')
 
     def test_custom_url(self):
         proxy = FreeProxy(url='http://httpbin.org/get')
         self.assertEqual(proxy.url, 'http://httpbin.org/get')
 
-    def __tr_elements(self):
-        return lh.fromstring(
-            '<tr>'
-            '<td>111.111.111.111</td><td>8080</td><td>CN</td><td class="hm">China</td><td>anonymous</td>'
-            '<td class="hm">no</td><td class="hx">yes</td><td class="hm">1 min ago</td>'
-            '</tr> <tr>'
-            '<td>222.222.222.222</td><td>8080</td><td>NL</td><td class="hm">Netherlands</td><td>elite proxy</td>'
-            '<td class="hm">yes</td><td class="hx">no</td><td class="hm">2 mins ago</td>'
-            '</tr>'
-        ).xpath('//tr')
+class TestResultCache(unittest.TestCase):
+    '''get() shares working proxies across identically configured instances.'''
+
+    def setUp(self):
+        FreeProxy._result_cache.clear()
+
+    def test_same_config_hits_cache(self):
+        first = FreeProxy()
+        first._get = MagicMock(return_value='http://1.1.1.1:8080')
+        self.assertEqual('http://1.1.1.1:8080', first.get())
+        second = FreeProxy()
+        second._get = MagicMock(return_value='http://2.2.2.2:8080')
+        self.assertEqual('http://1.1.1.1:8080', second.get())
+        second._get.assert_not_called()
+
+    def test_different_config_misses_cache(self):
+        first = FreeProxy()
+        first._get = MagicMock(return_value='http://1.1.1.1:8080')
+        first.get()
+        other = FreeProxy(country_id=['US'])
+        other._get = MagicMock(return_value='http://2.2.2.2:8080')
+        self.assertEqual('http://2.2.2.2:8080', other.get())
+
+    def test_expired_entry_is_refreshed(self):
+        subject = FreeProxy()
+        subject._get = MagicMock(return_value='http://1.1.1.1:8080')
+        subject.get()
+        key, (_, value) = next(iter(FreeProxy._result_cache.items()))
+        FreeProxy._result_cache[key] = (time.monotonic() - 1, value)
+        subject._get = MagicMock(return_value='http://2.2.2.2:8080')
+        self.assertEqual('http://2.2.2.2:8080', subject.get())
+
+    def test_failure_is_not_cached(self):
+        subject = FreeProxy()
+        subject._get = MagicMock(side_effect=FreeProxyException('There are no working proxies at this time.'))
+        self.assertRaises(FreeProxyException, subject.get)
+        self.assertEqual({}, FreeProxy._result_cache)
+
+
+class TestCriteria(unittest.TestCase):
+    '''_compile_criteria and _filter_and_finalize cover the filtering path.'''
+
+    def setUp(self):
+        self.anonymous = Proxy('111.111.111.111', '8080', 'CN', 'anonymous', False, True, 'https')
+        self.elite = Proxy('222.222.222.222', '8080', 'NL', 'elite', True, False, 'http')
+        self.transparent = Proxy('123.123.123.123', '8080', 'US', 'transparent', False, False, 'http')
+        self.proxies = [self.anonymous, self.elite, self.transparent]
+
+    def test_defaults_accept_everything(self):
+        subject = FreeProxy()
+        self.assertTrue(subject._filter_is_noop)
+        self.assertEqual(self.proxies, subject._filter_and_finalize(self.proxies))
+
+    def test_country_filter(self):
+        subject = FreeProxy(country_id=['CN'])
+        self.assertEqual([self.anonymous], subject._filter_and_finalize(self.proxies))
+
+    def test_anonym_filter(self):
+        subject = FreeProxy(anonym=True)
+        self.assertEqual([self.anonymous, self.elite], subject._filter_and_finalize(self.proxies))
+
+    def test_elite_filter(self):
+        subject = FreeProxy(elite=True)
+        self.assertEqual([self.elite], subject._filter_and_finalize(self.proxies))
+
+    def test_google_true_filter(self):
+        subject = FreeProxy(google=True)
+        self.assertEqual([self.elite], subject._filter_and_finalize(self.proxies))
+
+    def test_google_false_filter(self):
+        subject = FreeProxy(google=False)
+        self.assertEqual([self.anonymous, self.transparent], subject._filter_and_finalize(self.proxies))
+
+    def test_https_filter(self):
+        subject = FreeProxy(https=True)
+        self.assertEqual([self.anonymous], subject._filter_and_finalize(self.proxies))
+
+    def test_recompile_after_clearing_country(self):
+        subject = FreeProxy(country_id=['GB'])
+        self.assertEqual([], subject._filter_and_finalize(self.proxies))
+        subject.country_id = None
+        subject._compile_criteria()
+        self.assertEqual(self.proxies, subject._filter_and_finalize(self.proxies))
+
+    def test_country_fallback_refilters_without_refetch(self):
+        subject = FreeProxy(country_id=['GB'])
+        subject._fetch_all = MagicMock(return_value=self.proxies)
+        self.assertEqual(self.proxies, subject.get_proxy_list())
+        subject._fetch_all.assert_called_once()
 
 
 if __name__ == '__main__':